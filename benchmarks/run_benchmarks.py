@@ -0,0 +1,291 @@
+"""Микробенчмарки горячих участков: разбор строк порта, запись JSON,
+заполнение таблицы в update_data и усреднение в GraphicsBuilder.
+
+Запуск из корня репозитория (без дисплея, Qt работает в режиме offscreen):
+
+    python benchmarks/run_benchmarks.py                  # сравнить с baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline  # сохранить текущие результаты
+
+Без baseline сравнение невозможно, и скрипт завершается с кодом 2.
+Пиковая память (peak_kib) считается через tracemalloc и включает только
+выделения Python: для update_data память объектов Qt (QTableWidgetItem)
+в нее не входит.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Настройки окружения должны быть заданы до импорта Qt и модулей приложения
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("LORA_LOG_LEVEL", "WARNING")
+os.environ.setdefault("LORA_PACKETS_LOG_LEVEL", "WARNING")
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SCALES = [1000, 10000, 100000]
+
+# Замеры, у которых tracemalloc видит не всю память
+MEMORY_NOTES = {
+    'update_data': "peak_kib учитывает только выделения Python, память QTableWidgetItem внутри Qt не входит",
+}
+
+
+def make_packets(count, seed=0):
+    """Синтетические пакеты в формате PacketsInfoFiles"""
+    rng = random.Random(seed)
+    start = datetime(2025, 5, 3, 13, 0, 0)
+    packets = []
+    for i in range(count):
+        distance = rng.uniform(0, 2000)
+        packets.append({
+            'datetime': (start + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S"),
+            'distance': distance,
+            'bit_errors': rng.choice([0, 0, 0, 1, 3]),
+            'snr': round(10 - distance / 100 + rng.uniform(-2, 2), 2),
+            'rssi': float(round(-40 - distance / 20 + rng.uniform(-3, 3))),
+            'sf': 12,
+            'tx': 17,
+            'bw': rng.choice([125.0, 250.0, 500.0]),
+            'latitude': 55.75 + rng.uniform(-0.01, 0.01),
+            'longitude': 37.61 + rng.uniform(-0.01, 0.01),
+        })
+    return packets
+
+
+def make_serial_lines(count, seed=0):
+    """Синтетические строки порта: в основном пакеты, изредка смена настроек"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        if i % 50 == 0:
+            lines.append(f"SettingsUpdated{{ SF: {rng.choice([7, 9, 12])} TX: 17 BW: {rng.choice([125.0, 500.0])} }}")
+        else:
+            lines.append(f"PacketInfo{{ Rssi: {rng.randint(-120, -40)} Snr: {rng.uniform(-15, 10):.2f} Bit errors: {rng.randint(0, 5)} }}")
+    return lines
+
+
+def measure(func, min_time=0.5, max_iterations=1000, setup=None):
+    """Возвращает (операций в секунду, пиковая память одного вызова в КиБ).
+
+    setup, если задан, вызывается перед каждым вызовом func и не входит
+    в замер времени и памяти.
+    """
+    if setup is not None:
+        setup()
+    func()  # прогрев
+
+    iterations = 0
+    elapsed = 0.0
+    while elapsed < min_time and iterations < max_iterations:
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        elapsed += time.perf_counter() - started
+        iterations += 1
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return iterations / elapsed, peak / 1024
+
+
+def bench_parse_serial(scale, workdir):
+    from src.ClientRecieverGui import SETTINGS_PATTERN, PACKET_PATTERN
+    lines = make_serial_lines(scale)
+
+    def run():
+        for line in lines:
+            if not SETTINGS_PATTERN.match(line):
+                PACKET_PATTERN.match(line)
+    return run, scale, None  # одна операция - разбор всех строк
+
+
+def make_append_file(workdir, name, scale):
+    """Исходный файл из scale пакетов и функция, восстанавливающая его копию.
+
+    Копия восстанавливается перед каждым замером, чтобы каждый вызов
+    дописывал пакеты в файл одного и того же размера.
+    """
+    source = os.path.join(workdir, f"{name}_{scale}.source.json")
+    path = os.path.join(workdir, f"{name}_{scale}.json")
+    with open(source, 'w') as f:
+        json.dump(make_packets(scale), f, indent=2)
+
+    def restore():
+        shutil.copyfile(source, path)
+    return path, restore
+
+
+def bench_json_append(scale, workdir):
+    """Прежний цикл записи: чтение, добавление одного пакета, запись"""
+    from src.IngestPipeline import append_packets
+    path, restore = make_append_file(workdir, "append", scale)
+    packet = make_packets(1, seed=1)[0]
+
+    def run():
+        append_packets(path, [packet])
+    return run, 1, restore
+
+
+def bench_json_append_batch(scale, workdir):
+    """Цикл записи очереди: одна запись файла на пачку из 100 пакетов"""
+    from src.IngestPipeline import append_packets
+    path, restore = make_append_file(workdir, "append_batch", scale)
+    batch = make_packets(100, seed=1)
+
+    def run():
+        append_packets(path, batch)
+    return run, 100, restore
+
+
+def bench_update_data(scale, workdir):
+    window = get_window()
+    path = os.path.join(workdir, f"table_{scale}.json")
+    with open(path, 'w') as f:
+        json.dump(make_packets(scale), f, indent=2)
+    window.current_file = path
+    return window.update_data, scale, None
+
+
+def bench_average_by_distance(scale, workdir):
+    from src.GraphicsBuilder import GraphicsBuilder
+    builder = GraphicsBuilder(os.path.join(workdir, "average.json"))
+    packets = make_packets(scale)
+    distances = [p['distance'] for p in packets]
+    values = [p['snr'] for p in packets]
+
+    def run():
+        builder.average_by_distance_intervals(distances, values)
+    return run, scale, None
+
+
+BENCHMARKS = {
+    'parse_serial': bench_parse_serial,
+    'json_append': bench_json_append,
+    'json_append_batch': bench_json_append_batch,
+    'update_data': bench_update_data,
+    'average_by_distance': bench_average_by_distance,
+}
+
+_app = None
+_window = None
+
+
+def get_window():
+    """Главное окно создается один раз на offscreen платформе Qt"""
+    global _app, _window
+    if _window is None:
+        from PyQt6.QtWidgets import QApplication
+        from src import ClientReciever
+        from src.ClientRecieverGui import MainWindow
+        _app = QApplication.instance() or QApplication(sys.argv)
+        _window = MainWindow(ClientReciever)
+        _window.update_timer.stop()
+    return _window
+
+
+def run_benchmarks(names, scales, min_time):
+    results = {}
+    base_dir = tempfile.mkdtemp(prefix="lora_bench_")
+    workdir = os.path.join(base_dir, "app")
+    os.makedirs(workdir)
+    cwd = os.getcwd()
+    # Приложение создает рабочие каталоги относительно текущего (и "../GraphsFiles"),
+    # поэтому все запускается во вложенном временном каталоге
+    os.chdir(workdir)
+    try:
+        for name in names:
+            for scale in scales:
+                func, items, setup = BENCHMARKS[name](scale, workdir)
+                ops, peak_kib = measure(func, min_time, setup=setup)
+                key = f"{name}[{scale}]"
+                results[key] = {
+                    'ops_per_sec': ops,
+                    'items_per_sec': ops * items,
+                    'peak_kib': peak_kib,
+                }
+                print(f"{key:32} {ops:12.2f} ops/s {ops * items:14.0f} items/s {peak_kib:12.1f} KiB")
+    finally:
+        os.chdir(cwd)
+        if _window is not None:
+            _window.port_watcher.stop()
+        shutil.rmtree(base_dir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Возвращает список регрессий относительно baseline"""
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if result['ops_per_sec'] < reference['ops_per_sec'] * (1 - threshold):
+            regressions.append(
+                f"{key}: скорость {result['ops_per_sec']:.2f} ops/s, в baseline {reference['ops_per_sec']:.2f}"
+            )
+        if result['peak_kib'] > reference['peak_kib'] * (1 + threshold):
+            regressions.append(
+                f"{key}: память {result['peak_kib']:.1f} KiB, в baseline {reference['peak_kib']:.1f}"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки горячих участков LoRa Interface")
+    parser.add_argument('-b', '--benchmark', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('-s', '--scales', nargs='+', type=int, default=DEFAULT_SCALES)
+    parser.add_argument('--min-time', type=float, default=0.5, help="минимальное время замера, с")
+    parser.add_argument('--threshold', type=float, default=0.2, help="допустимое ухудшение, доля")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help="сохранить результаты как baseline")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.benchmark, args.scales, args.min_time)
+    for name in args.benchmark:
+        if name in MEMORY_NOTES:
+            print(f"Примечание ({name}): {MEMORY_NOTES[name]}")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r') as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline сохранен в {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Baseline {args.baseline} не найден, сравнение не выполнено; сохраните его с --save-baseline")
+        return 2
+
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"Регрессии больше {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("Регрессий не обнаружено")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
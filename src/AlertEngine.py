@@ -0,0 +1,244 @@
+import json
+import logging
+import operator
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+class ThresholdRule:
+    """Значение поля нарушает порог в count пакетах подряд"""
+
+    def __init__(self, name, field, op, threshold, count=1):
+        self.name = name
+        self.field = field
+        self.op = op
+        self.compare = OPERATORS[op]
+        self.threshold = threshold
+        self.count = count
+        self._streak = 0
+
+    def update(self, value):
+        self._streak = self._streak + 1 if self.compare(value, self.threshold) else 0
+        return self._streak >= self.count, value
+
+    def describe(self, value):
+        return f"{self.field} = {value} {self.op} {self.threshold} в {self.count} пакетах подряд"
+
+
+class WindowRule:
+    """Среднее значение поля за последние window пакетов нарушает порог.
+
+    Сумма окна поддерживается инкрементально, поэтому обновление O(1).
+    """
+
+    def __init__(self, name, field, op, threshold, window=10, scale=1.0):
+        self.name = name
+        self.field = field
+        self.op = op
+        self.compare = OPERATORS[op]
+        self.threshold = threshold
+        self.window = window
+        self.scale = scale
+        self._values = deque()
+        self._sum = 0.0
+
+    def update(self, value):
+        self._values.append(value)
+        self._sum += value
+        if len(self._values) > self.window:
+            self._sum -= self._values.popleft()
+        average = self._sum / len(self._values) * self.scale
+        return len(self._values) == self.window and self.compare(average, self.threshold), average
+
+    def describe(self, value):
+        return f"среднее {self.field} за {self.window} пакетов = {value:.2f} {self.op} {self.threshold}"
+
+
+class BitErrorRateRule(WindowRule):
+    """Доля ошибочных бит (в процентах) за последние window пакетов выше порога"""
+
+    def __init__(self, name, threshold, window=10, packet_bits=256):
+        super().__init__(name, 'bit_errors', '>', threshold, window, scale=100.0 / packet_bits)
+
+    def describe(self, value):
+        return f"BER за {self.window} пакетов = {value:.2f}% > {self.threshold}%"
+
+
+class SilenceRule:
+    """Нет пакетов дольше timeout секунд; проверяется по таймеру в tick()"""
+
+    def __init__(self, name, timeout):
+        self.name = name
+        self.timeout = timeout
+
+    def describe(self, value):
+        return f"нет пакетов {value:.0f} с (порог {self.timeout} с)"
+
+
+RULE_TYPES = {
+    'threshold': ThresholdRule,
+    'window': WindowRule,
+    'ber': BitErrorRateRule,
+    'silence': SilenceRule,
+}
+
+
+def rules_from_config(config):
+    """Создает правила из списка словарей вида {"type": "threshold", "name": ..., ...}"""
+    rules = []
+    names = set()
+    for entry in config:
+        params = dict(entry)
+        rule_type = params.pop('type')
+        if rule_type not in RULE_TYPES:
+            raise ValueError(f"Неизвестный тип правила: {rule_type}")
+        rule = RULE_TYPES[rule_type](**params)
+        if rule.name in names:
+            # По имени оповещения различаются в журнале и интерфейсе
+            raise ValueError(f"Повторяющееся имя правила: {rule.name}")
+        names.add(rule.name)
+        rules.append(rule)
+    return rules
+
+
+def load_rules(path):
+    with open(path, 'r') as f:
+        return rules_from_config(json.load(f))
+
+
+class AlertEngine:
+    """Проверка качества связи на потоке принятых пакетов.
+
+    Правила по пакетам сгруппированы по полю и обновляются за O(1) каждое,
+    правила отсутствия пакетов проверяются только в tick(). Оповещение
+    отправляется слушателям при переходе правила в сработавшее состояние
+    и обратно.
+
+    Правила отсутствия пакетов действуют, только пока включен хотя бы
+    один приёмник (arm_silence()); отсутствие отсчитывается от последнего
+    пакета или от включения приёмника.
+    """
+
+    def __init__(self, rules=()):
+        self._lock = threading.Lock()
+        self._packet_rules = defaultdict(list)
+        self._silence_rules = []
+        self._active = set()  # сработавшие правила (объекты, имена могут совпадать)
+        self._listeners = []
+        self._last_packet_at = None
+        self._armed_sources = set()
+        self._silence_triggered = False
+        self.stats = {'packets': 0, 'raised': 0, 'cleared': 0}
+        for rule in rules:
+            self.add_rule(rule)
+
+    def add_rule(self, rule):
+        with self._lock:
+            if isinstance(rule, SilenceRule):
+                self._silence_rules.append(rule)
+            else:
+                self._packet_rules[rule.field].append(rule)
+
+    def add_listener(self, callback):
+        """callback(alert) вызывается в потоке, который передал пакет или вызвал tick()"""
+        self._listeners.append(callback)
+
+    def arm_silence(self, source, now=None):
+        """Включает проверку отсутствия пакетов при подключении приёмника source
+        и начинает отсчет заново"""
+        with self._lock:
+            self._armed_sources.add(source)
+            self._last_packet_at = time.monotonic() if now is None else now
+
+    def disarm_silence(self, source):
+        """Отключает проверку для приёмника source; когда отключены все
+        приёмники, сработавшие правила отсутствия пакетов снимаются"""
+        alerts = []
+        with self._lock:
+            self._armed_sources.discard(source)
+            if not self._armed_sources and self._silence_triggered:
+                self._silence_triggered = False
+                for rule in self._silence_rules:
+                    self._transition(rule, False, 0.0, alerts)
+        self._notify(alerts)
+
+    def _transition(self, rule, triggered, value, alerts):
+        if triggered == (rule in self._active):
+            return
+        if triggered:
+            self._active.add(rule)
+            self.stats['raised'] += 1
+        else:
+            self._active.discard(rule)
+            self.stats['cleared'] += 1
+        alerts.append({
+            'rule': rule.name,
+            'active': triggered,
+            'value': value,
+            'message': rule.describe(value) if triggered else "условие больше не выполняется",
+            'datetime': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        })
+
+    def on_packet(self, packet, now=None):
+        """Обновляет правила по принятому пакету"""
+        alerts = []
+        with self._lock:
+            self.stats['packets'] += 1
+            self._last_packet_at = time.monotonic() if now is None else now
+            if self._silence_triggered:
+                self._silence_triggered = False
+                for rule in self._silence_rules:
+                    self._transition(rule, False, 0.0, alerts)
+            active = self._active
+            for field, rules in self._packet_rules.items():
+                value = packet.get(field)
+                if value is None:
+                    continue
+                value = float(value)
+                for rule in rules:
+                    triggered, observed = rule.update(value)
+                    if triggered != (rule in active):
+                        self._transition(rule, triggered, observed, alerts)
+        self._notify(alerts)
+
+    def tick(self, now=None):
+        """Проверяет правила отсутствия пакетов; вызывается периодически"""
+        if not self._silence_rules or not self._armed_sources:
+            return
+        alerts = []
+        with self._lock:
+            if not self._armed_sources:
+                return
+            silence = (time.monotonic() if now is None else now) - self._last_packet_at
+            for rule in self._silence_rules:
+                if silence > rule.timeout:
+                    self._silence_triggered = True
+                    self._transition(rule, True, silence, alerts)
+        self._notify(alerts)
+
+    def active_alerts(self):
+        with self._lock:
+            return sorted(rule.name for rule in self._active)
+
+    def _notify(self, alerts):
+        for alert in alerts:
+            if alert['active']:
+                logger.warning(f"Оповещение '{alert['rule']}': {alert['message']}")
+            else:
+                logger.info(f"Оповещение '{alert['rule']}' снято")
+            for callback in self._listeners:
+                try:
+                    callback(alert)
+                except Exception as e:
+                    logger.error(f"Ошибка в обработчике оповещения: {str(e)}", exc_info=True)
@@ -1,13 +1,19 @@
 import socketio
 import json
 import logging
+import os
 import sys
+import threading
 from PyQt6.QtWidgets import QApplication
-from .ClientRecieverGui import MainWindow
+from .ClientRecieverGui import MainWindow, log_pipeline
+from .LogPipeline import PACKETS_LOGGER
+from .IngestPipeline import IngestPipeline
+from .Deduplicator import Deduplicator
+from .AlertEngine import AlertEngine, load_rules, rules_from_config
+from .Geodesy import haversine_point
 
-# Настройка логирования
-logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
+packet_logger = logging.getLogger(PACKETS_LOGGER)
 
 # Создаем экземпляр Socket.IO клиента
 sio = socketio.Client(logger=False, engineio_logger=False)
@@ -27,9 +33,54 @@ current_settings = {
 Server_url = ""
 Lora_ip = "192.168."
 
+# Очередь записи пакетов; политика переполнения: block, drop_oldest или spill.
+# Повторы в одном файле (присланные сервером снова после переподключения или
+# пришедшие и с сервера, и из порта) отбрасываются в течение LORA_DEDUP_WINDOW
+# секунд, 0 отключает проверку. Пакеты из порта между собой не сравниваются.
+SOURCE_SOCKET = 'socket'
+SOURCE_SERIAL = 'serial'
+dedup_window = float(os.environ.get('LORA_DEDUP_WINDOW', 60))
+ingest = IngestPipeline(
+    overflow=os.environ.get('LORA_INGEST_OVERFLOW', 'spill'),
+    deduplicator=Deduplicator(window=dedup_window) if dedup_window > 0 else None
+)
+
+# Координаты передатчика; если заданы, расстояние считается по координатам пакета
+transmitter_position = {
+    "latitude": None,
+    "longitude": None
+}
+
+# Правила оповещений о качестве связи; свои правила можно задать в JSON файле
+DEFAULT_ALERT_RULES = [
+    {"type": "threshold", "name": "Слабый сигнал", "field": "rssi", "op": "<", "threshold": -115, "count": 5},
+    {"type": "ber", "name": "Битовые ошибки", "threshold": 1.0, "window": 20},
+    {"type": "silence", "name": "Нет пакетов", "timeout": 30},
+]
+alert_rules_file = os.environ.get('LORA_ALERT_RULES', 'alert_rules.json')
+
+def initial_alert_rules():
+    """Правила из alert_rules_file; при его отсутствии или ошибке - правила по умолчанию"""
+    if os.path.exists(alert_rules_file):
+        try:
+            return load_rules(alert_rules_file)
+        except Exception as e:
+            logger.error(f"Не удалось загрузить правила оповещений из {alert_rules_file}: {str(e)}, "
+                         f"используются правила по умолчанию")
+    return rules_from_config(DEFAULT_ALERT_RULES)
+
+alerts = AlertEngine(initial_alert_rules())
+
+# Активная запись сырых данных (SessionCapture.CaptureWriter) или None
+capture = None
+
 @sio.event
 def connect():
     logger.info('Подключение к серверу установлено')
+    if ingest.deduplicator is not None:
+        # Сервер может повторно прислать пакеты, отправленные до переподключения
+        ingest.deduplicator.reconnected(SOURCE_SOCKET)
+    alerts.arm_silence(SOURCE_SOCKET)
     sio.emit('register_desktop')
 
 @sio.event
@@ -39,67 +90,121 @@ def connect_error(data):
 @sio.event
 def disconnect():
     logger.info('Отключено от сервера')
+    alerts.disarm_silence(SOURCE_SOCKET)
+
+def emit_alert(alert):
+    if sio.connected:
+        sio.emit('link_alert', alert)
+
+alerts.add_listener(emit_alert)
 
 @sio.on('message')
 def on_message(data):
+    if capture is not None:
+        capture.record_message(data)
+    process_message(data)
+
+def process_message(data, replay=None):
+    """Обрабатывает сообщение сервера.
+
+    replay (SessionCapture.ReplayContext) задается при воспроизведении
+    записи: пакеты пишутся в файл воспроизведения, настройки не
+    отправляются на устройство, оповещения не проверяются.
+    """
     message = json.loads(data) if isinstance(data, str) else data
-    print(f'Получено сообщение: {message}')
+    packet_logger.debug('Получено сообщение: %s', message)
     
     if message.get("settings"):
-        update_settings(message["settings"])
-    
-    if "distance" in message:
-        current_settings["current_distance"] = message["distance"]
+        if replay is None:
+            update_settings(message["settings"])
+        else:
+            replay.settings = dict(message["settings"])
+    settings = current_settings if replay is None else replay.settings
     
     if "latitude" in message:
-        current_settings["latitude"] = message["latitude"]
+        settings["latitude"] = message["latitude"]
     if "longitude" in message:
-        current_settings["longitude"] = message["longitude"]
+        settings["longitude"] = message["longitude"]
+    
+    distance = packet_distance(
+        settings.get('latitude'),
+        settings.get('longitude'),
+        message.get('distance')
+    )
+    if distance is not None:
+        settings["current_distance"] = distance
         
     if all(key in message for key in ['datetime', 'distance', 'bit_errors', 'snr', 'rssi']):
         try:
-            try:
-                with open('packets_info.json', 'r') as f:
-                    packets = json.load(f)
-                    if not isinstance(packets, list):
-                        packets = []
-            except (FileNotFoundError, json.JSONDecodeError):
-                packets = []
-            
             packet_info = {
                 'datetime': str(message['datetime']),
-                'distance': float(message['distance']),
+                'distance': float(distance),
                 'bit_errors': int(message['bit_errors']),
                 'snr': float(message['snr']),
                 'rssi': float(message['rssi']),
-                'sf': int(current_settings['sf']),
-                'tx': int(current_settings['tx']),
-                'bw': float(current_settings['bw']),
-                'latitude': current_settings.get('latitude'),
-                'longitude': current_settings.get('longitude')
+                'sf': int(settings['sf']),
+                'tx': int(settings['tx']),
+                'bw': float(settings['bw']),
+                'latitude': settings.get('latitude'),
+                'longitude': settings.get('longitude')
             }
             
-            packets.append(packet_info)
-            
-            with open('packets_info.json', 'w') as f:
-                json.dump(packets, f, indent=2)
+            path = 'packets_info.json' if replay is None else replay.output_file
+            if not ingest.submit(path, packet_info, SOURCE_SOCKET):
+                packet_logger.debug('Повторный пакет отброшен: %s', packet_info)
+            elif replay is None:
+                alerts.on_packet(packet_info)
         except Exception as e:
-            print(f"Ошибка при сохранении данных: {str(e)}")
+            logger.error(f"Ошибка при сохранении данных: {str(e)}")
+
+def packet_distance(latitude, longitude, fallback):
+    """Расстояние от передатчика до точки приёма в метрах.
+    
+    Если координаты передатчика или пакета неизвестны или не являются
+    числами, возвращает fallback.
+    """
+    tx_latitude = transmitter_position.get('latitude')
+    tx_longitude = transmitter_position.get('longitude')
+    if None in (tx_latitude, tx_longitude, latitude, longitude):
+        return fallback
+    try:
+        latitude = float(latitude)
+        longitude = float(longitude)
+    except (ValueError, TypeError):
+        logger.warning(f"Некорректные координаты пакета: {latitude}, {longitude}")
+        return fallback
+    return haversine_point(tx_latitude, tx_longitude, latitude, longitude)
 
 def update_settings(new_settings):
     global current_settings
     current_settings = new_settings
-    print(f'Получены новые настройки: {current_settings}')
+    logger.info('Получены новые настройки: %s', current_settings)
     
+    # HTTP запрос к ESP32 выполняется вне потока Socket.IO
+    threading.Thread(
+        target=send_settings_to_device,
+        args=(dict(current_settings),),
+        daemon=True
+    ).start()
+
+def send_settings_to_device(settings):
     import requests
     from urllib.parse import urlencode
     params = urlencode({
-        "sf": current_settings["sf"],
-        "tx": current_settings["tx"],
-        "bw": current_settings["bw"]
+        "sf": settings["sf"],
+        "tx": settings["tx"],
+        "bw": settings["bw"]
     })
     headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-    response = requests.post(f"http://{Lora_ip}:80/update", data=params, headers=headers)
+    try:
+        response = requests.post(f"http://{Lora_ip}:80/update", data=params, headers=headers)
+    except Exception as e:
+        logger.error(f"Ошибка при отправке настроек на ESP32: {e}")
+        sio.emit('settings_update_response', {
+            "status": "error",
+            "message": f"Ошибка при отправке настроек на ESP32: {e}"
+        })
+        return
     if response.ok:
         logger.info("Настройки успешно отправлены на ESP32")
         sio.emit('settings_update_response', {
@@ -116,6 +221,7 @@ def update_settings(new_settings):
 def start_client():
     try:
         app = QApplication(sys.argv)
+        ingest.start()
         from PyQt6.QtGui import QPalette, QColor
         palette = QPalette()
         palette.setColor(QPalette.ColorRole.Window, QColor(245, 245, 245))
@@ -137,5 +243,8 @@ def start_client():
     except Exception as e:
         logger.error(f'Ошибка при запуске приложения: {e}')
         return 1
+    finally:
+        ingest.stop()
+        log_pipeline.stop()
 
 
@@ -2,30 +2,35 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QLabel, QLineEdit, QGroupBox, 
                             QTableWidget, QTableWidgetItem, QPushButton,
                             QMessageBox, QComboBox, QFileDialog, QTabWidget,
-                            QSizePolicy)
-from PyQt6.QtCore import QTimer, Qt
+                            QSizePolicy, QPlainTextEdit)
+from PyQt6.QtCore import QTimer, Qt, QThread, pyqtSignal
 import sys
 from datetime import datetime
 import json
 import serial
-import serial.tools.list_ports
 import re
 import os
+import time
+import threading
+import importlib.util
 import logging
 import traceback
 import folium
 import webbrowser
 from .GraphicsBuilder import GraphicsBuilder
+from .SessionComparison import SessionComparison
+from .PortWatcher import PortWatcher
+from .LogPipeline import setup_logging, PACKETS_LOGGER
+from .SessionCapture import CaptureWriter, Replayer, ReplayContext
+from .PacketsExporter import export_sessions, format_result
 
-# Настраиваем логирование
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Настраиваем логирование (запись в файл выполняется в отдельном потоке)
+log_pipeline = setup_logging()
+packet_logger = logging.getLogger(PACKETS_LOGGER)
+
+# Форматы строк, которые приёмник пишет в последовательный порт
+SETTINGS_PATTERN = re.compile(r"SettingsUpdated{\s*SF:\s*(\d+)\s*TX:\s*(\d+)\s*BW:\s*(\d+\.\d+)\s*}")
+PACKET_PATTERN = re.compile(r"PacketInfo{\s*Rssi:\s*(-?\d+)\s*Snr:\s*(-?\d+\.\d+)\s*Bit errors:\s*(\d+)\s*}")
 
 def exception_hook(exctype, value, tb):
     logging.error("Необработанное исключение:", exc_info=(exctype, value, tb))
@@ -33,7 +38,103 @@ def exception_hook(exctype, value, tb):
 
 sys.excepthook = exception_hook
 
+REPLAY_SPEEDS = {"1×": 1.0, "10×": 10.0, "100×": 100.0, "Максимально быстро": None}
+
+
+class ReplayThread(QThread):
+    """Воспроизводит запись сеанса в фоновом потоке.
+
+    Строки порта передаются в поток интерфейса через сигнал вместе со
+    временем их приёма по записи, так как process_serial_data работает
+    с виджетами. Сообщения сервера обрабатываются прямо в этом потоке,
+    как и при работе Socket.IO. Все данные обрабатываются в контексте
+    context (SessionCapture.ReplayContext), отдельно от текущего сеанса.
+    Время воспроизведения учитывает обработку всех переданных строк:
+    после последней записи поток ждет, пока интерфейс их обработает.
+    """
+
+    serial_line = pyqtSignal(str, str)
+    drain_marker = pyqtSignal()
+
+    def __init__(self, path, on_message, speed, context, parent=None):
+        super().__init__(parent)
+        self.context = context
+        self.replayer = Replayer(
+            path,
+            lambda line: self.serial_line.emit(line, context.packet_datetime(self.replayer.position)),
+            lambda data: on_message(data, replay=context),
+            speed
+        )
+        self._drained = threading.Event()
+        # Сигналы из потока воспроизведения обрабатываются в потоке интерфейса по порядку
+        self.drain_marker.connect(self._drained.set, Qt.ConnectionType.QueuedConnection)
+
+    def stop(self):
+        self.replayer.stop()
+        self._drained.set()
+
+    def run(self):
+        try:
+            started_at = time.monotonic()
+            stats = self.replayer.run()
+            if not self.replayer.stopped:
+                self.drain_marker.emit()
+                self._drained.wait()
+                stats['elapsed'] = time.monotonic() - started_at
+            logging.info(
+                f"Воспроизведение {self.replayer.path} завершено: строк порта {stats['serial']}, "
+                f"сообщений {stats['messages']}, за {stats['elapsed']:.2f} с"
+            )
+        except Exception as e:
+            logging.error(f"Ошибка при воспроизведении записи: {str(e)}", exc_info=True)
+
+
+class ExportThread(QThread):
+    """Экспортирует файлы сессий в фоновом потоке, чтобы не блокировать интерфейс"""
+
+    exported = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, paths, output_dir, formats, parent=None):
+        super().__init__(parent)
+        self.paths = paths
+        self.output_dir = output_dir
+        self.formats = formats
+
+    def run(self):
+        try:
+            self.exported.emit(export_sessions(self.paths, self.output_dir, self.formats))
+        except Exception as e:
+            logging.error(f"Ошибка при экспорте {self.paths}: {str(e)}", exc_info=True)
+            self.failed.emit(str(e))
+
+
+class ComparisonThread(QThread):
+    """Загружает агрегаты сессий для сравнения в фоновом потоке.
+
+    Графики строятся в потоке интерфейса, так как pyplot не
+    рассчитан на работу из других потоков.
+    """
+
+    loaded = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, comparison, parent=None):
+        super().__init__(parent)
+        self.comparison = comparison
+
+    def run(self):
+        try:
+            self.loaded.emit(self.comparison.load_aggregates())
+        except Exception as e:
+            logging.error(f"Ошибка при загрузке сессий для сравнения: {str(e)}", exc_info=True)
+            self.failed.emit(str(e))
+
+
 class MainWindow(QMainWindow):
+    # Оповещения приходят и из потока Socket.IO, поэтому передаются через сигнал
+    alert_raised = pyqtSignal(dict)
+
     def __init__(self, client):
         try:
             super().__init__()
@@ -62,9 +163,9 @@ class MainWindow(QMainWindow):
                 with open(test_file, 'w') as f:
                     f.write("test")
                 os.remove(test_file)
-                print("Права доступа к директории проверены успешно")
+                logging.info("Права доступа к директории проверены успешно")
             except Exception as e:
-                print(f"Ошибка при проверке прав доступа: {str(e)}")
+                logging.error(f"Ошибка при проверке прав доступа: {str(e)}")
                 QMessageBox.warning(self, "Предупреждение", "Обнаружены проблемы с правами доступа к файлам!")
             
             central_widget = QWidget()
@@ -79,11 +180,13 @@ class MainWindow(QMainWindow):
             connection_tab = QWidget()
             data_tab = QWidget()
             map_tab = QWidget()
+            log_tab = QWidget()
             
             # вкладки
             self.tabs.addTab(connection_tab, "Настройки подключения")
             self.tabs.addTab(data_tab, "Просмотр данных")
             self.tabs.addTab(map_tab, "Карта")
+            self.tabs.addTab(log_tab, "Журнал")
             
             connection_layout = QVBoxLayout(connection_tab)
             connection_layout.setContentsMargins(10, 10, 10, 10)
@@ -147,25 +250,72 @@ class MainWindow(QMainWindow):
             connection_group.setLayout(connection_settings_layout)
             connection_layout.addWidget(connection_group)
             
+            transmitter_group = QGroupBox("Координаты передатчика")
+            transmitter_group.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed)
+            transmitter_layout = QHBoxLayout()
+            self.tx_latitude_input = QLineEdit()
+            self.tx_latitude_input.setPlaceholderText("Широта")
+            self.tx_latitude_input.textChanged.connect(lambda text: self.update_transmitter_position('latitude', text))
+            self.tx_longitude_input = QLineEdit()
+            self.tx_longitude_input.setPlaceholderText("Долгота")
+            self.tx_longitude_input.textChanged.connect(lambda text: self.update_transmitter_position('longitude', text))
+            transmitter_layout.addWidget(QLabel("Широта:"))
+            transmitter_layout.addWidget(self.tx_latitude_input)
+            transmitter_layout.addWidget(QLabel("Долгота:"))
+            transmitter_layout.addWidget(self.tx_longitude_input)
+            transmitter_group.setLayout(transmitter_layout)
+            connection_layout.addWidget(transmitter_group)
+            
             com_group = QGroupBox("Последовательное подключение")
             com_group.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed)
             com_layout = QHBoxLayout()
             
             self.port_combo = QComboBox()
-            self.update_ports_list()
             com_layout.addWidget(self.port_combo)
             
+            # Список портов обновляется в фоне, без блокировки интерфейса
+            self.port_watcher = PortWatcher(interval=1.0)
+            self.port_watcher.ports_changed.connect(self.on_ports_changed)
+            
             refresh_button = QPushButton("Обновить порты")
-            refresh_button.clicked.connect(self.update_ports_list)
+            refresh_button.clicked.connect(self.request_ports_refresh)
             com_layout.addWidget(refresh_button)
             
             self.connect_serial_button = QPushButton("Подключиться к порту")
             self.connect_serial_button.clicked.connect(self.toggle_serial_connection)
             com_layout.addWidget(self.connect_serial_button)
             
+            self.serial_status = QLabel("Не подключено")
+            com_layout.addWidget(self.serial_status)
+            
             com_group.setLayout(com_layout)
             connection_layout.addWidget(com_group)
             
+            capture_group = QGroupBox("Запись и воспроизведение сеанса")
+            capture_group.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed)
+            capture_layout = QHBoxLayout()
+            
+            self.capture_button = QPushButton("Начать запись")
+            self.capture_button.clicked.connect(self.toggle_capture)
+            capture_layout.addWidget(self.capture_button)
+            
+            self.replay_speed_combo = QComboBox()
+            self.replay_speed_combo.addItems(list(REPLAY_SPEEDS))
+            capture_layout.addWidget(self.replay_speed_combo)
+            
+            self.replay_button = QPushButton("Воспроизвести запись")
+            self.replay_button.clicked.connect(self.toggle_replay)
+            capture_layout.addWidget(self.replay_button)
+            
+            self.capture_status = QLabel("-")
+            capture_layout.addWidget(self.capture_status)
+            
+            capture_group.setLayout(capture_layout)
+            connection_layout.addWidget(capture_group)
+            self.replay_thread = None
+            self.export_thread = None
+            self.comparison_thread = None
+            
             data_layout = QVBoxLayout(data_tab)
             data_layout.setContentsMargins(10, 10, 10, 10)
             data_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
@@ -208,6 +358,20 @@ class MainWindow(QMainWindow):
             last_packet_group.setLayout(last_packet_layout)
             data_layout.addWidget(last_packet_group)
             
+            alerts_group = QGroupBox("Оповещения о качестве связи")
+            alerts_layout = QVBoxLayout()
+            self.alerts_label = QLabel("Нет активных оповещений")
+            alerts_layout.addWidget(self.alerts_label)
+            alerts_group.setLayout(alerts_layout)
+            data_layout.addWidget(alerts_group)
+            
+            ingest_group = QGroupBox("Очередь записи")
+            ingest_layout = QVBoxLayout()
+            self.ingest_stats_label = QLabel("-")
+            ingest_layout.addWidget(self.ingest_stats_label)
+            ingest_group.setLayout(ingest_layout)
+            data_layout.addWidget(ingest_group)
+            
             files_group = QGroupBox("Файлы пакетов")
             files_layout = QHBoxLayout()
             
@@ -227,6 +391,18 @@ class MainWindow(QMainWindow):
             new_graphs_button.clicked.connect(self.create_new_graphs)
             files_layout.addWidget(new_graphs_button)
             
+            compare_button = QPushButton("Сравнить сессии")
+            compare_button.clicked.connect(self.create_comparison_graphs)
+            files_layout.addWidget(compare_button)
+            
+            export_button = QPushButton("Экспорт")
+            export_button.clicked.connect(self.export_current_file)
+            files_layout.addWidget(export_button)
+
+            export_sessions_button = QPushButton("Экспорт сессий")
+            export_sessions_button.clicked.connect(self.export_selected_files)
+            files_layout.addWidget(export_sessions_button)
+            
             files_group.setLayout(files_layout)
             data_layout.addWidget(files_group)
             
@@ -245,16 +421,44 @@ class MainWindow(QMainWindow):
             self.show_map_button.clicked.connect(self.create_map)
             map_layout.addWidget(self.show_map_button)
             
+            log_layout = QVBoxLayout(log_tab)
+            log_layout.setContentsMargins(10, 10, 10, 10)
+            self.log_view = QPlainTextEdit()
+            self.log_view.setReadOnly(True)
+            self.log_view.setMaximumBlockCount(log_pipeline.ring_buffer.records.maxlen)
+            log_layout.addWidget(self.log_view)
+            self.log_shown = 0
+            
             layout.addWidget(self.tabs)
             
             self.update_timer = QTimer()
             self.update_timer.timeout.connect(self.update_data)
+            self.update_timer.timeout.connect(self.client.alerts.tick)
+            
+            self.alert_raised.connect(self.show_alert)
+            self.client.alerts.add_listener(self.alert_raised.emit)
             self.update_timer.start(1000)
             
+            self.log_timer = QTimer()
+            self.log_timer.timeout.connect(self.update_log_view)
+            self.log_timer.start(500)
+            
             self.serial = None
             self.serial_timer = QTimer()
             self.serial_timer.timeout.connect(self.read_serial)
             
+            # Состояние автоматического переподключения приёмника
+            self.serial_port_name = None
+            self.serial_lost_at = None
+            self.serial_last_data_at = None
+            self.reconnect_gaps = []
+            # Единственный таймер повторных попыток на все время ожидания приёмника
+            self.reopen_timer = QTimer()
+            self.reopen_timer.setInterval(1000)
+            self.reopen_timer.timeout.connect(self.try_reopen_serial)
+            
+            self.port_watcher.start()
+            
         except Exception as e:
             logging.error(f"Ошибка при инициализации главного окна: {str(e)}", exc_info=True)
             QMessageBox.critical(self, "Ошибка", f"Ошибка при запуске приложения: {str(e)}")
@@ -266,6 +470,13 @@ class MainWindow(QMainWindow):
     def update_lora_ip(self, ip):
         self.client.Lora_ip = ip
         
+    def update_transmitter_position(self, key, text):
+        """Сохраняет координату передатчика; пустое или неверное значение отключает расчет"""
+        try:
+            self.client.transmitter_position[key] = float(text.replace(',', '.'))
+        except ValueError:
+            self.client.transmitter_position[key] = None
+        
     def update_data(self):
         try:
             # Обновление текущих настроек
@@ -280,6 +491,16 @@ class MainWindow(QMainWindow):
             else:
                 self.distance_label.setText("- м")
             
+            stats = self.client.ingest.stats
+            self.ingest_stats_label.setText(
+                f"В очереди: {len(self.client.ingest)}, записано: {stats['written']}, "
+                f"повторов отброшено: {stats['duplicates']}, "
+                f"пачек: {stats['batches']}, ожиданий: {stats['blocked']}, "
+                f"вытеснено: {stats['dropped_oldest']}, на диск: {stats['spilled']}, "
+                f"восстановлено: {stats['restored']}, повреждено: {stats['malformed']}, "
+                f"ошибок: {stats['errors']}"
+            )
+            
             # Загрузка и отображение истории пакетов
             try:
                 with open(self.current_file, 'r') as f:
@@ -309,11 +530,31 @@ class MainWindow(QMainWindow):
                             self.last_latitude_label.setText(f"Широта: {last_packet.get('latitude', '-')}")
                             self.last_longitude_label.setText(f"Долгота: {last_packet.get('longitude', '-')}")
             except (FileNotFoundError, json.JSONDecodeError) as e:
-                print(f"Ошибка при чтении файла {self.current_file}: {str(e)}")
+                logging.error(f"Ошибка при чтении файла {self.current_file}: {str(e)}")
         except Exception as e:
             logging.error(f"Ошибка при обновлении данных: {str(e)}", exc_info=True)
             QMessageBox.warning(self, "Ошибка", f"Ошибка при обновлении данных: {str(e)}")
 
+    def show_alert(self, alert):
+        """Показывает изменение состояния правила оповещения"""
+        if alert['active']:
+            self.statusBar().showMessage(f"{alert['datetime']} {alert['rule']}: {alert['message']}")
+        else:
+            self.statusBar().showMessage(f"{alert['datetime']} {alert['rule']}: оповещение снято", 10000)
+        
+        active = self.client.alerts.active_alerts()
+        self.alerts_label.setText("\n".join(active) if active else "Нет активных оповещений")
+    
+    def update_log_view(self):
+        """Показывает новые записи журнала из буфера в памяти"""
+        ring_buffer = log_pipeline.ring_buffer
+        new_count = ring_buffer.total - self.log_shown
+        if new_count <= 0 or not self.log_view.isVisible():
+            return
+        lines = ring_buffer.lines()[-min(new_count, len(ring_buffer.records)):]
+        self.log_view.appendPlainText("\n".join(lines))
+        self.log_shown = ring_buffer.total
+
     def toggle_connection(self):
         try:
             if self.connect_button.text() == "Подключиться к серверу":
@@ -335,19 +576,41 @@ class MainWindow(QMainWindow):
             logging.error(f"Ошибка при переключении соединения: {str(e)}", exc_info=True)
             QMessageBox.critical(self, "Ошибка", f"Ошибка при переключении соединения: {str(e)}")
 
-    def update_ports_list(self):
-        """Обновляет список доступных COM портов"""
+    def request_ports_refresh(self):
+        """Запрашивает фоновое обновление списка COM портов"""
+        self.port_watcher.refresh()
+    
+    def on_ports_changed(self, ports):
+        """Обновляет список доступных COM портов по сигналу PortWatcher"""
+        selected = self.port_combo.currentText()
         self.port_combo.clear()
-        ports = [port.device for port in serial.tools.list_ports.comports()]
         self.port_combo.addItems(ports)
+        index = self.port_combo.findText(selected)
+        if index >= 0:
+            self.port_combo.setCurrentIndex(index)
+        
+        if self.serial_lost_at is not None and self.serial_port_name in ports:
+            self.try_reopen_serial()
     
     def toggle_serial_connection(self):
         """Подключение/отключение от COM порта"""
-        if self.serial is None or not self.serial.is_open:
+        if self.serial_lost_at is not None:
+            # Отмена ожидания переподключения
+            self.reopen_timer.stop()
+            self.client.alerts.disarm_silence(self.client.SOURCE_SERIAL)
+            self.serial_lost_at = None
+            self.serial_port_name = None
+            self.connect_serial_button.setText("Подключиться к порту")
+            self.serial_status.setText("Не подключено")
+        elif self.serial is None or not self.serial.is_open:
             try:
                 port = self.port_combo.currentText()
                 self.serial = serial.Serial(port, 115200, timeout=0)
+                self.serial_port_name = port
+                self.serial_last_data_at = None
+                self.client.alerts.arm_silence(self.client.SOURCE_SERIAL)
                 self.connect_serial_button.setText("Отключиться")
+                self.serial_status.setText(f"Подключено к {port}")
                 self.serial_timer.start(100)  # Читаем порт каждые 100мс
             except Exception as e:
                 QMessageBox.critical(self, "Ошибка подключения", f"Не удалось подключиться: {str(e)}")
@@ -355,77 +618,124 @@ class MainWindow(QMainWindow):
             try:
                 self.serial_timer.stop()
                 self.serial.close()
+                self.client.alerts.disarm_silence(self.client.SOURCE_SERIAL)
                 self.serial = None
+                self.serial_port_name = None
                 self.connect_serial_button.setText("Подключиться к порту")
+                self.serial_status.setText("Не подключено")
             except Exception as e:
                 QMessageBox.warning(self, "Ошибка отключения", f"Ошибка при отключении: {str(e)}")
     
+    def handle_serial_lost(self, error):
+        """Переводит подключение в режим ожидания повторного появления приёмника"""
+        logging.warning(f"Потеряно соединение с портом {self.serial_port_name}: {str(error)}")
+        self.serial_timer.stop()
+        try:
+            self.serial.close()
+        except Exception:
+            pass
+        self.serial = None
+        self.serial_lost_at = time.monotonic()
+        self.reopen_timer.start()
+        self.serial_status.setText(f"Ожидание {self.serial_port_name}...")
+        self.port_watcher.refresh()
+    
+    def try_reopen_serial(self):
+        """Повторно открывает известный приёмник после его появления в системе"""
+        if self.serial_lost_at is None:
+            return
+        try:
+            self.serial = serial.Serial(self.serial_port_name, 115200, timeout=0)
+        except Exception as e:
+            # Узел устройства может появиться раньше, чем станет доступен;
+            # следующая попытка будет по reopen_timer
+            logging.debug(f"Не удалось переоткрыть {self.serial_port_name}: {str(e)}")
+            return
+        
+        self.reopen_timer.stop()
+        
+        reopened_at = time.monotonic()
+        gap = reopened_at - (self.serial_last_data_at or self.serial_lost_at)
+        self.reconnect_gaps.append(gap)
+        self.serial_lost_at = None
+        logging.info(f"Порт {self.serial_port_name} переподключен, данные отсутствовали {gap:.1f} с")
+        self.serial_status.setText(f"Переподключено, потеря данных {gap:.1f} с")
+        self.serial_timer.start(100)
+    
     def read_serial(self):
         try:
             if self.serial and self.serial.is_open:
                 try:
                     if self.serial.in_waiting:
                         line = self.serial.readline().decode('utf-8').strip()
-                        print(f"Прочитано из порта: {line}")
+                        self.serial_last_data_at = time.monotonic()
+                        packet_logger.debug("Прочитано из порта: %s", line)
+                        if line and self.client.capture is not None:
+                            self.client.capture.record_serial(line)
                         if line:
                             self.process_serial_data(line)
+                except (serial.SerialException, OSError) as e:
+                    self.handle_serial_lost(e)
                 except Exception as e:
-                    print(f"Ошибка чтения из порта: {str(e)}")
-                    import traceback
-                    print(traceback.format_exc())
+                    logging.error(f"Ошибка чтения из порта: {str(e)}", exc_info=True)
         except Exception as e:
             logging.error(f"Ошибка при чтении из порта: {str(e)}", exc_info=True)
             QMessageBox.warning(self, "Ошибка", f"Ошибка при чтении из порта: {str(e)}")
     
-    def process_serial_data(self, data):
+    def process_serial_data(self, data, replay=None, packet_datetime=None):
+        """Обрабатывает строку порта.
+
+        При воспроизведении записи replay - ее контекст, а packet_datetime -
+        время приёма строки по записи.
+        """
         try:
-            print(f"Получены данные: {data}")
+            packet_logger.debug("Получены данные: %s", data)
+            settings = self.client.current_settings if replay is None else replay.settings
             
-            settings_match = re.match(r"SettingsUpdated{\s*SF:\s*(\d+)\s*TX:\s*(\d+)\s*BW:\s*(\d+\.\d+)\s*}", data)
+            settings_match = SETTINGS_PATTERN.match(data)
             if settings_match:
-                print("Обнаружено обновление настроек")
                 sf, tx, bw = settings_match.groups()
-                self.client.current_settings.update({
+                settings.update({
                     "sf": int(sf),
                     "tx": int(tx),
                     "bw": float(bw)
                 })
-                print(f"Настройки обновлены: {self.client.current_settings}")
+                logging.info("Настройки обновлены: %s", settings)
                 return
 
-            packet_match = re.match(r"PacketInfo{\s*Rssi:\s*(-?\d+)\s*Snr:\s*(-?\d+\.\d+)\s*Bit errors:\s*(\d+)\s*}", data)
+            packet_match = PACKET_PATTERN.match(data)
             if packet_match:
-                print("Обнаружена информация о пакете")
                 rssi, snr, bit_errors = packet_match.groups()
+                latitude = settings.get('latitude')
+                longitude = settings.get('longitude')
+                distance = self.client.packet_distance(
+                    latitude,
+                    longitude,
+                    settings.get('current_distance') or 0
+                )
                 packet_info = {
-                    'datetime': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'distance': self.client.current_settings.get('current_distance', 0),
+                    'datetime': packet_datetime or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'distance': distance,
                     'bit_errors': int(bit_errors),
                     'snr': float(snr),
                     'rssi': float(rssi),
-                    'sf': self.client.current_settings['sf'],
-                    'tx': self.client.current_settings['tx'],
-                    'bw': self.client.current_settings['bw']
+                    'sf': settings['sf'],
+                    'tx': settings['tx'],
+                    'bw': settings['bw'],
+                    'latitude': latitude,
+                    'longitude': longitude
                 }
-                print(f"Сформирован пакет: {packet_info}")
+                packet_logger.debug("Сформирован пакет: %s", packet_info)
                 
                 try:
-                    try:
-                        with open(self.current_file, 'r') as f:
-                            packets = json.load(f)
-                            if not isinstance(packets, list):
-                                packets = []
-                    except (FileNotFoundError, json.JSONDecodeError):
-                        packets = []
-                    
-                    print(f"Текущее количество пакетов: {len(packets)}")
-                    
-                    packets.append(packet_info)
-                    
-                    with open(self.current_file, 'w') as f:
-                        json.dump(packets, f, indent=2)
-                    
-                    print(f"Пакет сохранен, всего пакетов: {len(packets)}")
+                    # Запись в файл выполняет поток очереди, таблица обновится по таймеру
+                    path = self.current_file if replay is None else replay.output_file
+                    if not self.client.ingest.submit(path, packet_info, self.client.SOURCE_SERIAL):
+                        packet_logger.debug("Повторный пакет отброшен: %s", packet_info)
+                        return
+                    packet_logger.info("Пакет поставлен в очередь записи: %s", path)
+                    if replay is None:
+                        self.client.alerts.on_packet(packet_info)
                     
                     self.last_datetime_label.setText(f"Дата и время: {packet_info['datetime']}")
                     self.last_rssi_label.setText(f"RSSI: {packet_info['rssi']}")
@@ -433,18 +743,85 @@ class MainWindow(QMainWindow):
                     self.last_errors_label.setText(f"Битовые ошибки: {packet_info['bit_errors']}")
                     self.last_distance_label.setText(f"Расстояние: {packet_info['distance']:.2f} м")
                     
-                    self.update_data()
-                    
                 except Exception as e:
-                    print(f"Ошибка при сохранении данных пакета: {str(e)}")
-                    import traceback
-                    print(traceback.format_exc())
+                    logging.error(f"Ошибка при сохранении данных пакета: {str(e)}", exc_info=True)
         except Exception as e:
             logging.error(f"Ошибка при обработке данных: {str(e)}", exc_info=True)
             QMessageBox.warning(self, "Ошибка", f"Ошибка при обработке данных: {str(e)}")
 
+    def toggle_capture(self):
+        """Начинает или останавливает запись сырых данных приёмников"""
+        if self.client.capture is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = os.path.join("Captures", f"capture_{timestamp}.lrcap")
+            try:
+                self.client.capture = CaptureWriter(path)
+            except Exception as e:
+                QMessageBox.critical(self, "Ошибка", f"Не удалось начать запись: {str(e)}")
+                return
+            self.capture_button.setText("Остановить запись")
+            self.capture_status.setText(f"Запись в {path}")
+        else:
+            capture = self.client.capture
+            self.client.capture = None
+            capture.close()
+            self.capture_button.setText("Начать запись")
+            self.capture_status.setText(f"Записано {capture.records} событий в {capture.path}")
+    
+    def toggle_replay(self):
+        """Запускает или прерывает воспроизведение записи сеанса"""
+        if self.replay_thread is not None and self.replay_thread.isRunning():
+            self.replay_thread.stop()
+            return
+        
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Открыть запись сеанса",
+            "Captures",
+            "Записи сеанса (*.lrcap)"
+        )
+        if not path:
+            return
+        
+        speed = REPLAY_SPEEDS[self.replay_speed_combo.currentText()]
+        try:
+            # Воспроизведение не меняет текущие настройки и файлы сессий
+            context = ReplayContext(path, self.client.current_settings)
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось открыть запись: {str(e)}")
+            return
+        self.replay_thread = ReplayThread(path, self.client.process_message, speed, context)
+        self.replay_thread.serial_line.connect(self.process_replayed_serial)
+        self.replay_thread.finished.connect(self.on_replay_finished)
+        self.replay_button.setText("Остановить воспроизведение")
+        self.capture_status.setText(f"Воспроизведение {os.path.basename(path)} в {context.output_file}")
+        self.replay_thread.start()
+    
+    def process_replayed_serial(self, line, packet_datetime):
+        self.process_serial_data(line, self.replay_thread.context, packet_datetime)
+    
+    def on_replay_finished(self):
+        stats = self.replay_thread.replayer.stats
+        self.replay_button.setText("Воспроизвести запись")
+        self.capture_status.setText(
+            f"Воспроизведено: строк порта {stats['serial']}, сообщений {stats['messages']} "
+            f"за {stats['elapsed']:.2f} с, пакеты в {self.replay_thread.context.output_file}"
+        )
+    
     def closeEvent(self, event):
         try:
+            self.port_watcher.stop()
+            self.reopen_timer.stop()
+            if self.replay_thread is not None:
+                self.replay_thread.stop()
+                self.replay_thread.wait()
+            if self.export_thread is not None:
+                # Дожидаемся экспорта, чтобы не оставить недописанные файлы
+                self.export_thread.wait()
+            if self.comparison_thread is not None:
+                self.comparison_thread.wait()
+            if self.client.capture is not None:
+                self.client.capture.close()
             if self.serial and self.serial.is_open:
                 self.serial.close()
             event.accept()
@@ -518,6 +895,86 @@ class MainWindow(QMainWindow):
             )
 
 
+    def create_comparison_graphs(self):
+        """Строит графики SNR/RSSI для нескольких сессий на общих осях"""
+        filenames, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Выберите файлы сессий для сравнения",
+            "PacketsInfoFiles",
+            "JSON файлы (*.json)"
+        )
+        if not filenames:
+            return
+        if self.comparison_thread is not None and self.comparison_thread.isRunning():
+            QMessageBox.warning(self, "Предупреждение", "Сравнение уже выполняется")
+            return
+        
+        try:
+            comparison = SessionComparison(filenames)
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось построить графики сравнения: {str(e)}")
+            return
+        # Чтение и агрегирование файлов выполняется в фоне, графики - по сигналу
+        self.comparison_thread = ComparisonThread(comparison)
+        self.comparison_thread.loaded.connect(self.on_comparison_loaded)
+        self.comparison_thread.failed.connect(self.on_comparison_failed)
+        self.comparison_thread.start()
+        logging.info(f"Запущено сравнение {len(filenames)} сессий")
+    
+    def on_comparison_loaded(self, aggregates):
+        try:
+            snr_plot, rssi_plot = self.comparison_thread.comparison.create_all_plots(aggregates)
+            QMessageBox.information(
+                self,
+                "Успех",
+                f"Графики сравнения созданы!\nГрафик SNR: {snr_plot}\nГрафик RSSI: {rssi_plot}"
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось построить графики сравнения: {str(e)}")
+    
+    def on_comparison_failed(self, error):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось построить графики сравнения: {error}")
+
+    def export_current_file(self):
+        """Экспортирует текущий файл в CSV и, если установлен pyarrow, в Parquet"""
+        self.start_export([self.current_file])
+
+    def export_selected_files(self):
+        """Экспортирует несколько выбранных сессий, по одному процессу на файл"""
+        filenames, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Выберите файлы сессий для экспорта",
+            "PacketsInfoFiles",
+            "JSON файлы (*.json)"
+        )
+        if not filenames:
+            return
+        self.start_export(filenames)
+
+    def start_export(self, paths):
+        """Запускает экспорт в фоновом потоке; результат приходит через сигналы"""
+        if self.export_thread is not None and self.export_thread.isRunning():
+            QMessageBox.warning(self, "Предупреждение", "Экспорт уже выполняется")
+            return
+        formats = ['csv']
+        if importlib.util.find_spec('pyarrow') is not None:
+            formats.append('parquet')
+        self.export_thread = ExportThread(paths, "ExportFiles", formats)
+        self.export_thread.exported.connect(self.on_export_finished)
+        self.export_thread.failed.connect(self.on_export_failed)
+        self.export_thread.start()
+        logging.info(f"Запущен экспорт {len(paths)} файлов")
+
+    def on_export_finished(self, results):
+        QMessageBox.information(
+            self,
+            "Успех",
+            "Экспорт завершен:\n" + "\n".join(format_result(path, result) for path, result in results.items())
+        )
+
+    def on_export_failed(self, error):
+        QMessageBox.critical(self, "Ошибка", f"Не удалось экспортировать файл: {error}")
+
     # нужна другая библиотека...
     def create_map(self):
         """Создает интерактивную карту с точками из текущего файла"""
@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Поля, по которым пакет считается тем же самым
+FINGERPRINT_FIELDS = ('datetime', 'rssi', 'snr', 'bit_errors', 'sf', 'tx', 'bw')
+
+
+def fingerprint(packet, fields=FINGERPRINT_FIELDS):
+    """Отпечаток пакета; числа приводятся к float, чтобы -45 и -45.0 совпадали"""
+    values = []
+    for field in fields:
+        value = packet.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        values.append(value)
+    return tuple(values)
+
+
+class Deduplicator:
+    """Подавление повторных пакетов при приёме.
+
+    Поля пакета не содержат счетчика прошивки, а время в них с точностью
+    до секунды, поэтому разные пакеты могут иметь одинаковый отпечаток.
+    Пакеты сравниваются только в пределах одного файла назначения path:
+    копия в другом файле не является лишней строкой и не отбрасывается.
+    Для каждого отпечатка хранится число копий от каждого источника
+    (например, 'socket' и 'serial'), и повтором считается только:
+      - копия, уже доставленная другим источником: каждая копия одного
+        источника закрывает не больше одной копии другого;
+      - повторная доставка тем же источником после его переподключения
+        (см. reconnected()), как при повторной отправке сервером.
+    Пакеты одного источника без переподключения не отбрасываются.
+
+    Записи старше window секунд устаревают; словарь с порядком вставки
+    дает O(1) на пакет, размер индекса ограничен max_entries.
+    """
+
+    def __init__(self, window=60.0, max_entries=100000, fields=FINGERPRINT_FIELDS):
+        self.window = window
+        self.max_entries = max_entries
+        self.fields = fields
+        # (файл, отпечаток) -> (время первого приёма, {источник: [копий, номер подключения]})
+        self._index = OrderedDict()
+        self._connections = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'checked': 0,
+            'duplicates': 0,
+            'redelivered': 0,
+            'cross_source': 0,
+            'evicted': 0,
+        }
+
+    def _evict(self, now):
+        while self._index:
+            key, (seen_at, _) = next(iter(self._index.items()))
+            if now - seen_at <= self.window and len(self._index) <= self.max_entries:
+                break
+            del self._index[key]
+            self.stats['evicted'] += 1
+
+    def reconnected(self, source):
+        """Отмечает переподключение источника: дальнейшие повторы его уже
+        принятых пакетов считаются повторной доставкой"""
+        with self._lock:
+            self._connections[source] = self._connections.get(source, 0) + 1
+
+    def is_duplicate(self, packet, source=None, path=None, now=None):
+        """Проверяет пакет от источника source, записываемый в файл path,
+        и запоминает его отпечаток"""
+        key = (path, fingerprint(packet, self.fields))
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.stats['checked'] += 1
+            self._evict(now)
+            connection = self._connections.get(source, 0)
+            entry = self._index.get(key)
+            if entry is None:
+                self._index[key] = (now, {source: [1, connection]})
+                return False
+
+            sources = entry[1]
+            own = sources.get(source)
+            if own is not None and own[1] < connection:
+                # Тот же источник прислал пакет снова после переподключения
+                self.stats['redelivered'] += 1
+                self.stats['duplicates'] += 1
+                return True
+
+            copies = own[0] if own is not None else 0
+            other = max((count for name, (count, _) in sources.items() if name != source), default=0)
+            if own is None:
+                sources[source] = [1, connection]
+            else:
+                own[0] += 1
+            if other > copies:
+                # Эту копию уже доставил другой источник
+                self.stats['cross_source'] += 1
+                self.stats['duplicates'] += 1
+                return True
+            return False
+
+    def clear(self):
+        with self._lock:
+            self._index.clear()
+
+
+def packet_timestamp(packet):
+    try:
+        return datetime.strptime(str(packet.get('datetime')), DATETIME_FORMAT).timestamp()
+    except ValueError:
+        return None
+
+
+def deduplicate_packets(packets, window=None, fields=FINGERPRINT_FIELDS):
+    """Удаляет повторы из списка пакетов, сохраняя первое вхождение.
+
+    Без window повтором считается любой пакет с уже встречавшимся отпечатком.
+    С window повтор учитывается, только если время пакета (поле datetime)
+    отличается от первого вхождения не больше чем на window секунд.
+    """
+    if window is None:
+        seen = set()
+        kept = []
+        for packet in packets:
+            key = fingerprint(packet, fields)
+            if key not in seen:
+                seen.add(key)
+                kept.append(packet)
+        return kept
+
+    # Источник пакетов в файле неизвестен, поэтому повтором считается
+    # любое совпадение отпечатка в пределах window от первого вхождения
+    first_seen = {}
+    kept = []
+    for packet in packets:
+        timestamp = packet_timestamp(packet)
+        if timestamp is None:
+            kept.append(packet)
+            continue
+        key = fingerprint(packet, fields)
+        seen_at = first_seen.get(key)
+        if seen_at is not None and abs(timestamp - seen_at) <= window:
+            continue
+        first_seen[key] = timestamp
+        kept.append(packet)
+    return kept
+
+
+def deduplicated_path(json_file_path):
+    base, ext = os.path.splitext(json_file_path)
+    return f"{base}.dedup{ext or '.json'}"
+
+
+def deduplicate_file(json_file_path, window, output_path=None, in_place=False):
+    """Удаляет повторы из файла пакетов; возвращает (оставлено, удалено, путь результата).
+
+    Результат пишется в output_path, по умолчанию рядом с исходным файлом
+    (<имя>.dedup.json); исходный файл перезаписывается только при in_place.
+    """
+    with open(json_file_path, 'r') as f:
+        packets = json.load(f)
+
+    kept = deduplicate_packets(packets, window)
+
+    if in_place:
+        output_path = json_file_path
+    output_path = output_path or deduplicated_path(json_file_path)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(kept, f, indent=2)
+    os.replace(tmp_path, output_path)
+    return len(kept), len(packets) - len(kept), output_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Удаление повторяющихся пакетов из файлов сессий")
+    parser.add_argument('files', nargs='+', help="JSON файлы сессий")
+    # Разные пакеты в пределах одной секунды могут совпадать по всем полям,
+    # поэтому окно задается явно и без значения по умолчанию
+    parser.add_argument('--window', type=float, required=True,
+                        help="окно в секундах по полю datetime, в пределах которого совпадающие пакеты считаются повторами")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('-o', '--output', help="файл результата (только для одного входного файла)")
+    output.add_argument('--in-place', action='store_true', help="перезаписать исходные файлы")
+    args = parser.parse_args(argv)
+    if args.output and len(args.files) > 1:
+        parser.error("--output можно указать только для одного файла")
+
+    for path in args.files:
+        kept, dropped, output_path = deduplicate_file(path, args.window, args.output, args.in_place)
+        print(f"{path}: оставлено {kept}, удалено повторов {dropped}, результат в {output_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import argparse
+import json
+import math
+import os
+import sys
+import numpy as np
+
+EARTH_RADIUS = 6371008.8  # средний радиус Земли, м
+
+# Эллипсоид WGS-84
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Векторное расстояние по большому кругу в метрах; координаты в градусах"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_point(lat1, lon1, lat2, lon2):
+    """То же для одной пары точек, без накладных расходов numpy"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(1.0, a)))
+
+
+def vincenty(lat1, lon1, lat2, lon2, max_iterations=200, tolerance=1e-12):
+    """Векторная обратная задача Винсенти на эллипсоиде WGS-84, результат в метрах.
+
+    Для почти диаметрально противоположных точек, где итерация не сходится,
+    возвращается расстояние по формуле гаверсинусов.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (lat1, lon1, lat2, lon2)))
+    U1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    L = np.radians(lon2 - lon1)
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    # Точки без координат (NaN) в итерациях не участвуют
+    active = np.isfinite(L) & np.isfinite(U1) & np.isfinite(U2)
+    for _ in range(max_iterations):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam)
+        cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+        C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+        lam_new = L + (1 - C) * WGS84_F * sin_alpha * (
+            sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+        )
+        converged = np.abs(lam_new - lam) <= tolerance
+        lam = np.where(active, lam_new, lam)
+        active &= ~converged
+        if not active.any():
+            break
+
+    u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+    ))
+    distance = WGS84_B * A * (sigma - delta_sigma)
+
+    if active.any():
+        distance = np.where(active, haversine(lat1, lon1, lat2, lon2), distance)
+    return distance
+
+
+METHODS = {
+    'haversine': haversine,
+    'vincenty': vincenty,
+}
+
+
+def distances_from(latitudes, longitudes, tx_latitude, tx_longitude, method='haversine'):
+    """Расстояния от передатчика до массива точек; для точек без координат - NaN"""
+    return METHODS[method](tx_latitude, tx_longitude, latitudes, longitudes)
+
+
+def coordinate_value(value):
+    """Координата как float; отсутствующее или нечисловое значение ('', 'N/A') - NaN"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def coordinate_columns(packets):
+    """Достает широту и долготу пакетов в массивы, отсутствующие и
+    некорректные значения - NaN (у таких пакетов расстояние не меняется)"""
+    latitudes = np.array([coordinate_value(p.get('latitude')) for p in packets], dtype=float)
+    longitudes = np.array([coordinate_value(p.get('longitude')) for p in packets], dtype=float)
+    return latitudes, longitudes
+
+
+def recompute_file(json_file_path, tx_latitude, tx_longitude, method='haversine', output_path=None):
+    """Пересчитывает поле distance во всех пакетах файла, у которых есть координаты.
+
+    Возвращает число пакетов с обновленным расстоянием.
+    """
+    with open(json_file_path, 'r') as f:
+        packets = json.load(f)
+
+    latitudes, longitudes = coordinate_columns(packets)
+    distances = distances_from(latitudes, longitudes, tx_latitude, tx_longitude, method)
+    valid = np.isfinite(distances)
+    for index in np.flatnonzero(valid):
+        packets[index]['distance'] = float(distances[index])
+
+    output_path = output_path or json_file_path
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(packets, f, indent=2)
+    os.replace(tmp_path, output_path)
+    return int(valid.sum())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пересчет расстояний до передатчика по координатам пакетов")
+    parser.add_argument('files', nargs='+', help="JSON файлы сессий")
+    parser.add_argument('--tx-lat', type=float, required=True, help="широта передатчика")
+    parser.add_argument('--tx-lon', type=float, required=True, help="долгота передатчика")
+    parser.add_argument('--method', choices=list(METHODS), default='haversine')
+    args = parser.parse_args(argv)
+
+    for path in args.files:
+        updated = recompute_file(path, args.tx_lat, args.tx_lon, args.method)
+        print(f"{path}: пересчитано {updated} расстояний")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'spill')
+
+
+class IngestPipeline:
+    """Очередь приёма пакетов между приёмниками и записью в файлы.
+
+    Приёмники (Socket.IO, последовательный порт) только кладут пакет в
+    ограниченную очередь, а отдельный поток записи забирает пакеты пачками
+    и сохраняет каждую пачку одним циклом чтения-записи JSON файла.
+
+    При переполнении очереди действует политика overflow:
+      block       - приёмник ждет освобождения места;
+      drop_oldest - самый старый пакет в очереди отбрасывается;
+      spill       - пакет дописывается в файл на диске и сохраняется позже.
+
+    Пока файл вытеснения не пуст, новые пакеты тоже дописываются в него,
+    а поток записи сохраняет его только после пакетов, уже стоящих в
+    очереди, поэтому порядок пакетов в файлах сессий не нарушается.
+    Порядок не гарантируется только для пакетов, запись которых завершилась
+    ошибкой и была отложена на повторную попытку.
+
+    Если задан deduplicator, повторные пакеты отбрасываются до постановки
+    в очередь; source в submit указывает, каким путем пришел пакет.
+    """
+
+    def __init__(self, maxsize=1000, batch_size=100, flush_interval=0.5,
+                 overflow='spill', spill_file=os.path.join("PacketsInfoFiles", "ingest_spill.jsonl"),
+                 deduplicator=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Неизвестная политика переполнения: {overflow}")
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.spill_file = spill_file
+        self.deduplicator = deduplicator
+        os.makedirs(os.path.dirname(spill_file) or ".", exist_ok=True)
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+        self._spilling = False
+
+        self.stats = {
+            'submitted': 0,
+            'duplicates': 0,
+            'written': 0,
+            'batches': 0,
+            'blocked': 0,
+            'dropped_oldest': 0,
+            'spilled': 0,
+            'restored': 0,
+            'malformed': 0,
+            'errors': 0,
+        }
+
+    def __len__(self):
+        return len(self._queue)
+
+    def submit(self, path, packet, source=None):
+        """Ставит пакет от приёмника source в очередь на запись в файл path;
+        для повтора возвращает False"""
+        if self.deduplicator is not None and self.deduplicator.is_duplicate(packet, source, path):
+            with self._condition:
+                self.stats['duplicates'] += 1
+            return False
+        with self._condition:
+            self.stats['submitted'] += 1
+            if self._spilling:
+                # Более старые пакеты еще лежат на диске - сохраняем порядок
+                self._spill(path, packet)
+                return True
+            if len(self._queue) >= self.maxsize:
+                if self.overflow == 'block':
+                    self.stats['blocked'] += 1
+                    while len(self._queue) >= self.maxsize and not self._stopped:
+                        self._condition.wait()
+                elif self.overflow == 'drop_oldest':
+                    self._queue.popleft()
+                    self.stats['dropped_oldest'] += 1
+                else:
+                    self._spill(path, packet)
+                    return True
+            self._queue.append((path, packet))
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify_all()
+            return True
+
+    def start(self):
+        if self._thread is None:
+            self._stopped = False
+            # Пакеты, оставшиеся на диске после прошлого запуска, сохраняются первыми
+            self._terminate_partial_line()
+            self._spilling = os.path.exists(self.spill_file) or os.path.exists(self._draining_file)
+            self._thread = threading.Thread(target=self._run, name="IngestWriter", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает поток записи, предварительно сохранив всю очередь"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def _draining_file(self):
+        return self.spill_file + ".draining"
+
+    def _terminate_partial_line(self):
+        """Завершает строку, оборванную при аварийном завершении, чтобы
+        следующая запись не склеилась с ней"""
+        try:
+            with open(self.spill_file, 'rb+') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    return
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+        except FileNotFoundError:
+            pass
+
+    def _spill(self, path, packet):
+        with self._spill_lock:
+            with open(self.spill_file, 'a') as f:
+                f.write(json.dumps({'path': path, 'packet': packet}) + "\n")
+            self.stats['spilled'] += 1
+            self._spilling = True
+
+    def _take_batch(self):
+        with self._condition:
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._queue) < self.batch_size and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            self._condition.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            try:
+                # Пакеты с диска старше всех, что еще в очереди нет, поэтому
+                # файл вытеснения сохраняется, когда очередь опустела
+                if self._spilling and not self._queue:
+                    self._restore_spilled()
+                batch = self._take_batch()
+                if batch:
+                    self._write_batch(batch)
+                if self._stopped and not self._queue:
+                    if self._spilling:
+                        self._restore_spilled()
+                    break
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Ошибка в потоке записи пакетов: {str(e)}", exc_info=True)
+                if self._stopped:
+                    # Неусохраненные пакеты остаются в файле вытеснения до следующего запуска
+                    break
+                time.sleep(self.flush_interval)
+
+    def _restore_spilled(self):
+        """Сохраняет пакеты, вытесненные на диск при переполнении"""
+        draining = self._draining_file
+        # Файл .draining остается, если прошлое сохранение прервалось;
+        # он старше файла вытеснения и сохраняется первым
+        if not os.path.exists(draining):
+            with self._spill_lock:
+                if not os.path.exists(self.spill_file):
+                    self._spilling = False
+                    return
+                os.replace(self.spill_file, draining)
+
+        batch = []
+        malformed = 0
+        with open(draining, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    batch.append((record['path'], record['packet']))
+                except (ValueError, KeyError, TypeError):
+                    # Обычно это последняя строка, оборванная при аварийном завершении
+                    malformed += 1
+        if malformed:
+            self.stats['malformed'] += malformed
+            logger.warning(f"Пропущено поврежденных строк в {draining}: {malformed}")
+
+        # Пакеты, которые не удалось записать, _write_batch вернет в файл вытеснения
+        self.stats['restored'] += self._write_batch(batch)
+        os.remove(draining)
+
+        with self._condition:
+            with self._spill_lock:
+                if not os.path.exists(self.spill_file):
+                    self._spilling = False
+
+    def _write_batch(self, batch):
+        """Сохраняет пачку и возвращает число записанных пакетов"""
+        by_path = defaultdict(list)
+        for path, packet in batch:
+            by_path[path].append(packet)
+
+        written = 0
+        for path, packets in by_path.items():
+            try:
+                append_packets(path, packets)
+                written += len(packets)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Ошибка при сохранении {len(packets)} пакетов в {path}: {str(e)}", exc_info=True)
+                # Не теряем пакеты: откладываем их на диск до следующей попытки
+                for packet in packets:
+                    self._spill(path, packet)
+        self.stats['written'] += written
+        self.stats['batches'] += 1
+        return written
+
+
+def append_packets(path, packets):
+    """Дописывает пакеты в JSON файл одной операцией чтения-записи"""
+    try:
+        with open(path, 'r') as f:
+            existing = json.load(f)
+            if not isinstance(existing, list):
+                existing = []
+    except (FileNotFoundError, json.JSONDecodeError):
+        existing = []
+
+    existing.extend(packets)
+
+    # Пишем во временный файл, чтобы интерфейс не прочитал файл наполовину
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(existing, f, indent=2)
+    os.replace(tmp_path, path)
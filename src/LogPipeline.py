@@ -0,0 +1,125 @@
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Логгер для сообщений о каждом пакете (строки порта, сообщения сервера)
+PACKETS_LOGGER = "lora.packets"
+
+
+class RateLimitFilter(logging.Filter):
+    """Пропускает каждую N-ю запись и не больше max_per_second записей в секунду.
+
+    Предупреждения и ошибки проходят всегда.
+    """
+
+    def __init__(self, sample_every=1, max_per_second=20):
+        super().__init__()
+        self.sample_every = max(1, sample_every)
+        self.max_per_second = max_per_second
+        self.suppressed = 0
+        self._counter = 0
+        self._window_start = 0.0
+        self._window_count = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            self._counter += 1
+            if self._counter % self.sample_every:
+                self.suppressed += 1
+                return False
+
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_count = 0
+            if self.max_per_second and self._window_count >= self.max_per_second:
+                self.suppressed += 1
+                return False
+            self._window_count += 1
+            return True
+
+
+class RingBufferHandler(logging.Handler):
+    """Хранит последние записи журнала в памяти для отображения в интерфейсе"""
+
+    def __init__(self, capacity=1000):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+        self.total = 0  # счетчик для определения новых записей
+
+    def emit(self, record):
+        self.records.append(self.format(record))
+        self.total += 1
+
+    def lines(self):
+        return list(self.records)
+
+
+class LogPipeline:
+    """Неблокирующий журнал: потоки приложения кладут записи в очередь,
+    запись в файл и консоль выполняет отдельный поток QueueListener.
+    """
+
+    def __init__(self, log_file='app.log', level=None, packets_level=None,
+                 sample_every=None, max_per_second=None, buffer_capacity=1000):
+        self.level = level or os.environ.get('LORA_LOG_LEVEL', 'INFO')
+        self.packets_level = packets_level or os.environ.get('LORA_PACKETS_LOG_LEVEL', 'INFO')
+        # Выборка сообщений о пакетах: каждое N-е и не больше M в секунду (0 - без ограничения)
+        if sample_every is None:
+            sample_every = int(os.environ.get('LORA_PACKETS_LOG_SAMPLE', 1))
+        if max_per_second is None:
+            max_per_second = int(os.environ.get('LORA_PACKETS_LOG_RATE', 20))
+        self.queue = queue.SimpleQueue()
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(formatter)
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(formatter)
+        self.ring_buffer = RingBufferHandler(buffer_capacity)
+        self.ring_buffer.setFormatter(formatter)
+
+        self.listener = logging.handlers.QueueListener(
+            self.queue, file_handler, stream_handler, self.ring_buffer,
+            respect_handler_level=True
+        )
+        self.rate_limit = RateLimitFilter(sample_every, max_per_second)
+
+    def start(self):
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(logging.handlers.QueueHandler(self.queue))
+        root.setLevel(self.level)
+
+        packets_logger = logging.getLogger(PACKETS_LOGGER)
+        packets_logger.setLevel(self.packets_level)
+        packets_logger.addFilter(self.rate_limit)
+
+        self.listener.start()
+        return self
+
+    def stop(self):
+        """Дописывает оставшиеся записи и останавливает поток журнала"""
+        self.listener.stop()
+
+
+_pipeline = None
+
+
+def setup_logging(**kwargs):
+    """Настраивает журнал приложения один раз и возвращает LogPipeline"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LogPipeline(**kwargs).start()
+    return _pipeline
@@ -0,0 +1,258 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Колонки экспорта и их типы
+COLUMNS = [
+    ('datetime', 'datetime'),
+    ('distance', 'float'),
+    ('snr', 'float'),
+    ('rssi', 'float'),
+    ('bit_errors', 'int'),
+    ('sf', 'int'),
+    ('tx', 'int'),
+    ('bw', 'float'),
+    ('latitude', 'float'),
+    ('longitude', 'float'),
+]
+
+EXPORT_FORMATS = ('csv', 'parquet', 'arrow')
+
+
+def iter_packets(path, read_size=1 << 16):
+    """Потоково читает пакеты из JSON массива, не загружая весь файл в память"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+        started = False
+        while True:
+            # Пропускаем пробелы и разделители между элементами
+            while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ',')):
+                pos += 1
+            if pos >= len(buffer):
+                if eof:
+                    if started:
+                        raise ValueError(f"Файл {path} оборван или поврежден")
+                    return
+                buffer, pos = f.read(read_size), 0
+                eof = not buffer
+                continue
+
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError(f"Файл {path} не содержит массив пакетов")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+
+            try:
+                packet, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Элемент не поместился в буфер целиком - дочитываем файл
+                if eof:
+                    raise ValueError(f"Файл {path} оборван или поврежден")
+                chunk = f.read(read_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            if isinstance(packet, dict):
+                yield packet
+
+
+def convert_value(value, kind):
+    """Приводит значение к типу колонки; нераспознанное значение - None"""
+    if value is None or value == '':
+        return None
+    try:
+        if kind == 'datetime':
+            return datetime.strptime(str(value), DATETIME_FORMAT)
+        if kind == 'int':
+            return int(value)
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_column_chunks(path, chunk_rows=50000, invalid=None):
+    """Возвращает пакеты порциями в виде типизированных колонок.
+
+    Если передан словарь invalid, в нем подсчитывается число непустых
+    значений каждой колонки, которые не удалось распознать и которые
+    экспортированы как пустые.
+    """
+    chunk = {name: [] for name, _ in COLUMNS}
+    rows = 0
+    for packet in iter_packets(path):
+        for name, kind in COLUMNS:
+            raw = packet.get(name)
+            value = convert_value(raw, kind)
+            if value is None and invalid is not None and raw is not None and raw != '':
+                invalid[name] = invalid.get(name, 0) + 1
+            chunk[name].append(value)
+        rows += 1
+        if rows >= chunk_rows:
+            yield chunk
+            chunk = {name: [] for name, _ in COLUMNS}
+            rows = 0
+    if rows:
+        yield chunk
+
+
+def arrow_schema():
+    import pyarrow as pa
+    types = {
+        'datetime': pa.timestamp('s'),
+        'float': pa.float64(),
+        'int': pa.int32(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS])
+
+
+def export_csv(path, output_path, chunk_rows=50000, invalid=None):
+    rows = 0
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in COLUMNS])
+        for chunk in iter_column_chunks(path, chunk_rows, invalid):
+            columns = [chunk[name] for name, _ in COLUMNS]
+            for row in zip(*columns):
+                writer.writerow([
+                    value.strftime(DATETIME_FORMAT) if isinstance(value, datetime) else
+                    '' if value is None else value
+                    for value in row
+                ])
+            rows += len(columns[0])
+    return rows
+
+
+def export_arrow(path, output_path, file_format='parquet', chunk_rows=50000, invalid=None):
+    """Экспорт в Parquet или Arrow IPC с записью по одной порции за раз"""
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для экспорта в Parquet/Arrow установите пакет pyarrow")
+
+    schema = arrow_schema()
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(output_path, schema)
+    else:
+        writer = pa.ipc.new_file(output_path, schema)
+
+    rows = 0
+    try:
+        for chunk in iter_column_chunks(path, chunk_rows, invalid):
+            table = pa.Table.from_pydict(chunk, schema=schema)
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        writer.close()
+    return rows
+
+
+def export_session(path, output_dir, formats=('csv',), chunk_rows=50000, name=None):
+    """Экспортирует один файл сессии во все указанные форматы.
+
+    Возвращает {путь результата: {'rows': строк, 'invalid': {колонка: число
+    нераспознанных значений}}}. name - имя результата без расширения,
+    по умолчанию имя файла сессии.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    results = {}
+    for file_format in formats:
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Неизвестный формат экспорта: {file_format}")
+        output_path = os.path.join(output_dir, f"{name}.{file_format}")
+        invalid = {}
+        if file_format == 'csv':
+            rows = export_csv(path, output_path, chunk_rows, invalid)
+        else:
+            rows = export_arrow(path, output_path, file_format, chunk_rows, invalid)
+        results[output_path] = {'rows': rows, 'invalid': invalid}
+    return results
+
+
+def output_names(paths):
+    """Уникальные имена результатов для файлов сессий.
+
+    Файлы с одинаковым именем из разных каталогов получают имя каталога
+    в качестве префикса, чтобы параллельный экспорт не записал их в один файл.
+    """
+    names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    used = set()
+    unique = []
+    for path, name in zip(paths, names):
+        if names.count(name) > 1:
+            parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+            name = f"{parent}_{name}"
+        candidate, index = name, 2
+        while candidate in used:
+            candidate = f"{name}_{index}"
+            index += 1
+        used.add(candidate)
+        unique.append(candidate)
+    return unique
+
+
+def format_result(output_path, result):
+    """Строка отчета об экспорте одного файла"""
+    text = f"{output_path}: {result['rows']} строк"
+    if result['invalid']:
+        text += ", не распознано и оставлено пустым: " + ", ".join(
+            f"{column} {count}" for column, count in result['invalid'].items()
+        )
+    return text
+
+
+def export_sessions(paths, output_dir, formats=('csv',), workers=None, chunk_rows=50000):
+    """Параллельно экспортирует несколько сессий, по одному процессу на файл"""
+    # Один и тот же файл, выбранный дважды, экспортируется один раз
+    paths = list(dict.fromkeys(os.path.abspath(path) for path in paths))
+    names = output_names(paths)
+    if len(paths) == 1:
+        return export_session(paths[0], output_dir, formats, chunk_rows, names[0])
+
+    results = {}
+    # spawn вместо fork: экспорт запускается и из процесса с Qt и потоками,
+    # а их состояние нельзя безопасно копировать в дочерний процесс
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [
+            executor.submit(export_session, path, output_dir, formats, chunk_rows, name)
+            for path, name in zip(paths, names)
+        ]
+        for future in futures:
+            results.update(future.result())
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Экспорт файлов пакетов в CSV/Parquet/Arrow")
+    parser.add_argument('files', nargs='+', help="JSON файлы сессий")
+    parser.add_argument('-o', '--output-dir', default="ExportFiles")
+    parser.add_argument('-f', '--format', nargs='+', default=['csv'], choices=EXPORT_FORMATS)
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="число параллельных процессов")
+    parser.add_argument('--chunk-rows', type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    results = export_sessions(args.files, args.output_dir, args.format, args.jobs, args.chunk_rows)
+    for output_path, result in results.items():
+        print(format_result(output_path, result))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+import os
+import sys
+import threading
+import logging
+import serial.tools.list_ports
+
+SYSFS_TTY_DIR = "/sys/class/tty"
+
+
+class PortWatcher(QThread):
+    """Фоновое отслеживание подключения и отключения последовательных портов.
+
+    На Linux опрашивает sysfs (/sys/class/tty) и вызывает comports() только
+    когда набор устройств действительно изменился. На остальных платформах
+    comports() вызывается в фоновом потоке с заданным интервалом.
+    """
+
+    ports_changed = pyqtSignal(list)
+
+    def __init__(self, interval=1.0, parent=None):
+        super().__init__(parent)
+        self.interval = interval  # период опроса в секундах
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._signature = None
+        self._ports = None
+
+    def sysfs_signature(self):
+        """Возвращает набор tty-устройств, у которых есть физическое устройство.
+
+        Чтение каталога sysfs намного дешевле, чем полный comports(),
+        поэтому используется как быстрый признак изменений.
+        """
+        if not sys.platform.startswith("linux") or not os.path.isdir(SYSFS_TTY_DIR):
+            return None
+        try:
+            return frozenset(
+                name for name in os.listdir(SYSFS_TTY_DIR)
+                if os.path.exists(os.path.join(SYSFS_TTY_DIR, name, "device"))
+            )
+        except OSError:
+            return None
+
+    def scan(self, force=False):
+        """Проверяет список портов и отправляет сигнал, если он изменился"""
+        signature = self.sysfs_signature()
+        if not force and signature is not None and signature == self._signature:
+            return
+        self._signature = signature
+
+        ports = sorted(port.device for port in serial.tools.list_ports.comports())
+        if ports != self._ports:
+            self._ports = ports
+            logging.info(f"Список портов изменился: {ports}")
+            self.ports_changed.emit(ports)
+        elif force:
+            # Явный запрос обновления: отправляем список, даже если он не изменился
+            self.ports_changed.emit(ports)
+
+    def refresh(self):
+        """Запрашивает немедленное обновление списка портов"""
+        self._signature = None
+        self._wakeup.set()
+
+    def run(self):
+        while not self._stopped:
+            force = self._wakeup.is_set()
+            self._wakeup.clear()
+            try:
+                self.scan(force)
+            except Exception as e:
+                logging.error(f"Ошибка при опросе портов: {str(e)}", exc_info=True)
+            self._wakeup.wait(self.interval)
+
+    def stop(self):
+        """Останавливает опрос и дожидается завершения потока"""
+        self._stopped = True
+        self._wakeup.set()
+        self.wait()
@@ -0,0 +1,166 @@
+import json
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+
+# Формат файла записи: заголовок MAGIC и время начала записи (UNIX, double),
+# затем записи [тип: 1 байт][время от начала записи, с: double][длина: uint32][данные].
+# В записях версии 1 (MAGIC_V1) времени начала нет.
+MAGIC = b"LRCAP\x02"
+MAGIC_V1 = b"LRCAP\x01"
+START_HEADER = struct.Struct("<d")
+RECORD_HEADER = struct.Struct("<BdI")
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+KIND_SERIAL = 0        # строка последовательного порта
+KIND_MESSAGE_TEXT = 1  # сообщение Socket.IO, пришедшее строкой
+KIND_MESSAGE_JSON = 2  # сообщение Socket.IO, пришедшее объектом
+
+
+class CaptureWriter:
+    """Записывает сырые данные приёмников в двоичный файл.
+
+    Время каждой записи берется из монотонных часов относительно
+    начала записи, поэтому не зависит от перевода системных часов.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._file.write(START_HEADER.pack(time.time()))
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self.records = 0
+
+    def _write(self, kind, payload):
+        offset = time.monotonic() - self._started_at
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(RECORD_HEADER.pack(kind, offset, len(payload)))
+            self._file.write(payload)
+            self.records += 1
+
+    def record_serial(self, line):
+        self._write(KIND_SERIAL, line.encode('utf-8'))
+
+    def record_message(self, data):
+        if isinstance(data, str):
+            self._write(KIND_MESSAGE_TEXT, data.encode('utf-8'))
+        else:
+            self._write(KIND_MESSAGE_JSON, json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _read_header(f, path):
+    """Проверяет заголовок и возвращает время начала записи или None"""
+    magic = f.read(len(MAGIC))
+    if magic == MAGIC:
+        header = f.read(START_HEADER.size)
+        if len(header) < START_HEADER.size:
+            return None
+        return START_HEADER.unpack(header)[0]
+    if magic == MAGIC_V1:
+        return None
+    raise ValueError(f"Файл {path} не является записью сеанса")
+
+
+def capture_started_at(path):
+    """Время начала записи (UNIX) или None для записей без него"""
+    with open(path, 'rb') as f:
+        return _read_header(f, path)
+
+
+def read_capture(path):
+    """Последовательно читает файл записи, возвращая (время, тип, данные)"""
+    with open(path, 'rb') as f:
+        _read_header(f, path)
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                # Конец файла или запись, оборванная при аварийном завершении
+                return
+            kind, offset, length = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            text = payload.decode('utf-8')
+            yield offset, kind, json.loads(text) if kind == KIND_MESSAGE_JSON else text
+
+
+class Replayer:
+    """Воспроизводит запись через обработчики строк порта и сообщений сервера.
+
+    speed задает ускорение относительно реального времени (1.0 - реальное
+    время, 10.0 - в 10 раз быстрее), None или 0 - максимально быстро.
+    """
+
+    def __init__(self, path, on_serial, on_message, speed=1.0):
+        self.path = path
+        self.on_serial = on_serial
+        self.on_message = on_message
+        self.speed = speed
+        self.position = 0.0  # время текущей записи от начала записи, с
+        self._stopped = threading.Event()
+        self.stats = {'serial': 0, 'messages': 0, 'elapsed': 0.0}
+
+    def stop(self):
+        """Прерывает воспроизведение, в том числе во время ожидания паузы записи"""
+        self._stopped.set()
+
+    @property
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def run(self):
+        started_at = time.monotonic()
+        for offset, kind, payload in read_capture(self.path):
+            if self.speed:
+                delay = started_at + offset / self.speed - time.monotonic()
+                if delay > 0 and self._stopped.wait(delay):
+                    break
+            if self._stopped.is_set():
+                break
+            self.position = offset
+            if kind == KIND_SERIAL:
+                self.on_serial(payload)
+                self.stats['serial'] += 1
+            else:
+                self.on_message(payload)
+                self.stats['messages'] += 1
+        self.stats['elapsed'] = time.monotonic() - started_at
+        return self.stats
+
+
+class ReplayContext:
+    """Обработка воспроизводимой записи отдельно от текущего сеанса.
+
+    Пакеты сохраняются в свой файл output_dir/<имя записи>.json (он
+    перезаписывается при каждом воспроизведении), настройки приёмника из
+    записи меняют только settings контекста и не отправляются на
+    устройство, а время пакетов порта берется из записи.
+    """
+
+    def __init__(self, capture_path, settings, output_dir="Replays"):
+        name = os.path.splitext(os.path.basename(capture_path))[0]
+        self.output_file = os.path.join(output_dir, f"{name}.json")
+        self.settings = dict(settings)
+        # Для записей без времени начала время отсчитывается от начала воспроизведения
+        self.started_at = capture_started_at(capture_path)
+        if self.started_at is None:
+            self.started_at = time.time()
+        os.makedirs(output_dir, exist_ok=True)
+        with open(self.output_file, 'w') as f:
+            json.dump([], f)
+
+    def packet_datetime(self, offset):
+        """Время пакета, принятого через offset секунд после начала записи"""
+        return datetime.fromtimestamp(self.started_at + offset).strftime(DATETIME_FORMAT)
@@ -0,0 +1,172 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+METRICS = {
+    'snr': ('SNR (дБ)', 'SNR'),
+    'rssi': ('RSSI (дБм)', 'RSSI'),
+}
+
+
+def compute_aggregates(json_file_path, distance_interval):
+    """Считает суммы по интервалам расстояний для каждого значения BW.
+
+    Интервалы отсчитываются от нуля, поэтому у всех сессий общая сетка
+    и агрегаты разных файлов можно сравнивать и объединять.
+    """
+    with open(json_file_path, 'r') as f:
+        data = json.load(f)
+
+    columns = {'bw': [], 'distance': [], 'snr': [], 'rssi': []}
+    for packet in data:
+        try:
+            row = {key: float(packet[key]) for key in columns}
+        except (KeyError, TypeError, ValueError):
+            continue
+        for key, value in row.items():
+            columns[key].append(value)
+
+    bw = np.array(columns['bw'])
+    distances = np.array(columns['distance'])
+    bins = np.floor(distances / distance_interval).astype(np.int64)
+
+    aggregates = {}
+    for bw_value in np.unique(bw):
+        mask = bw == bw_value
+        bw_bins, inverse = np.unique(bins[mask], return_inverse=True)
+        aggregates[str(float(bw_value))] = {
+            'bins': bw_bins.tolist(),
+            'count': np.bincount(inverse).tolist(),
+            'distance': np.bincount(inverse, weights=distances[mask]).tolist(),
+            'snr': np.bincount(inverse, weights=np.array(columns['snr'])[mask]).tolist(),
+            'rssi': np.bincount(inverse, weights=np.array(columns['rssi'])[mask]).tolist(),
+        }
+    return aggregates
+
+
+def cache_path_for(json_file_path, cache_dir):
+    # Хэш полного пути различает одноименные файлы из разных каталогов
+    name = os.path.splitext(os.path.basename(json_file_path))[0]
+    digest = hashlib.sha1(os.path.abspath(json_file_path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{name}.{digest}.aggregates.json")
+
+
+def read_cached_aggregates(json_file_path, distance_interval, cache_dir):
+    """Возвращает агрегаты из кэша, если файл сессии не менялся, иначе None"""
+    stat = os.stat(json_file_path)
+    try:
+        with open(cache_path_for(json_file_path, cache_dir), 'r') as f:
+            cached = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if (cached.get('source') == os.path.abspath(json_file_path)
+            and cached.get('mtime_ns') == stat.st_mtime_ns
+            and cached.get('size') == stat.st_size
+            and cached.get('distance_interval') == distance_interval):
+        return cached['aggregates']
+    return None
+
+
+def build_cached_aggregates(json_file_path, distance_interval, cache_dir):
+    """Считает агрегаты файла и сохраняет их в кэш"""
+    stat = os.stat(json_file_path)
+    aggregates = compute_aggregates(json_file_path, distance_interval)
+    with open(cache_path_for(json_file_path, cache_dir), 'w') as f:
+        json.dump({
+            'source': os.path.abspath(json_file_path),
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'distance_interval': distance_interval,
+            'aggregates': aggregates,
+        }, f)
+    return aggregates
+
+
+class SessionComparison:
+    def __init__(self, json_file_paths, workers=None):
+        self.json_file_paths = list(json_file_paths)
+        self.workers = workers
+        self.graphs_dir = os.path.join("../GraphsFiles", "comparison")
+        self.cache_dir = os.path.join("../GraphsFiles", ".cache")
+        os.makedirs(self.graphs_dir, exist_ok=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.distance_interval = 15  # интервал для группировки в метрах
+
+    def load_aggregates(self):
+        """Загружает агрегаты всех сессий; пересчитываются только измененные файлы"""
+        aggregates = {}
+        missing = []
+        for path in self.json_file_paths:
+            cached = read_cached_aggregates(path, self.distance_interval, self.cache_dir)
+            if cached is None:
+                missing.append(path)
+            else:
+                aggregates[path] = cached
+
+        if len(missing) == 1:
+            aggregates[missing[0]] = build_cached_aggregates(missing[0], self.distance_interval, self.cache_dir)
+        elif missing:
+            # spawn вместо fork: сравнение запускается из процесса с Qt и потоками
+            # записи, копировать их состояние в дочерние процессы небезопасно
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+                futures = {
+                    path: executor.submit(build_cached_aggregates, path, self.distance_interval, self.cache_dir)
+                    for path in missing
+                }
+                for path, future in futures.items():
+                    aggregates[path] = future.result()
+
+        return {path: aggregates[path] for path in self.json_file_paths}
+
+    def create_plot(self, metric, aggregates=None):
+        """Создает график зависимости SNR или RSSI от расстояния для всех сессий"""
+        ylabel, title = METRICS[metric]
+        if aggregates is None:
+            aggregates = self.load_aggregates()
+
+        series = []
+        for path, bw_groups in aggregates.items():
+            session = os.path.splitext(os.path.basename(path))[0]
+            for bw in sorted(bw_groups, key=float):
+                label = session if len(bw_groups) == 1 else f"{session}, BW = {bw} kHz"
+                series.append((label, bw_groups[bw]))
+
+        plt.figure(figsize=(12, 8))
+
+        # Разные цвета для разных сессий
+        colors = plt.cm.rainbow(np.linspace(0, 1, max(len(series), 1)))
+
+        for (label, group), color in zip(series, colors):
+            count = np.array(group['count'], dtype=float)
+            avg_distances = np.array(group['distance']) / count
+            avg_values = np.array(group[metric]) / count
+            plt.scatter(avg_distances, avg_values, alpha=0.7, color=color, label=label)
+            plt.plot(avg_distances, avg_values, '-', color=color, alpha=0.5)
+
+        plt.xlabel('Расстояние (м)')
+        plt.ylabel(ylabel)
+        plt.title(f'Сравнение сессий: {title} от расстояния (усреднение по {self.distance_interval}м)')
+        plt.grid(True)
+        plt.legend()
+
+        # Добавляем временную метку к имени файла
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = os.path.join(self.graphs_dir, f'{metric}_vs_distance_comparison_{timestamp}.png')
+        plt.savefig(filename)
+        plt.close()
+
+        return filename
+
+    def create_all_plots(self, aggregates=None):
+        """Создает графики SNR и RSSI по всем сессиям"""
+        if aggregates is None:
+            aggregates = self.load_aggregates()
+        snr_plot = self.create_plot('snr', aggregates)
+        rssi_plot = self.create_plot('rssi', aggregates)
+        return snr_plot, rssi_plot